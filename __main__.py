@@ -5,6 +5,8 @@ from gke.cluster import GkeClusterStack
 from gke.compute import GkeNodePoolStack
 from gke.bastion import GkeBastionHostStack
 from gke.moodle import MoodleStack
+from gke.sizing import plan_capacity
+from gke.iam import IamPolicyBuilder
 
 # Load configuration
 config = pulumi.Config()
@@ -13,9 +15,19 @@ config = pulumi.Config()
 cluster_name = config.require("cluster_name")
 region = config.require("cluster_region")
 zone = config.require("cluster_region")
+expected_users = config.get_int("expected_concurrent_users") or 100
+peak_users = config.get_int("peak_users") or 2 * expected_users
+# Render Kubernetes objects to this directory instead of applying them to the cluster
+k8s_render_dir = config.get("k8s_render_dir")
 latest_engine_version = container.get_engine_versions(location=region).release_channel_latest_version['REGULAR']
 pulumi.export("latest_engine_version", latest_engine_version)
 
+# Derive node pool, Moodle and backend sizing from the expected user load
+capacity_plan = plan_capacity(
+    concurrent_users=expected_users,
+    peak_users=peak_users,
+)
+
 network_stack = NetworkStack(
     name=cluster_name,
     region=region
@@ -26,22 +38,32 @@ gke_cluster_stack = GkeClusterStack(
     region=region,
     vpc_id=network_stack.vpc.id,
     private_subnet=network_stack.private_subnet,
-    gke_version=latest_engine_version
+    gke_version=latest_engine_version,
+    render_yaml_to_directory=k8s_render_dir
 )
 
 gke_nodepool_stack = GkeNodePoolStack(
     name=cluster_name,
     region=region,
     cluster_name=gke_cluster_stack.gke_cluster.name,
-    machine_type='e2-small'
+    capacity_plan=capacity_plan
 )
 
+# Project IAM grants of all components, written as one policy update
+iam_policy = IamPolicyBuilder()
+
 # gke_bastion_host = GkeBastionHostStack(
 #     vpc_id=network_stack.vpc.id,
 #     region=region,
 #     private_subnet_id=network_stack.private_subnet.id,
+#     iam_policy=iam_policy,
+#     prebaked_image=config.get("bastion_image"),
+#     use_mig=True,
 # )
 
+if iam_policy.pairs:
+    iam_policy.apply(f"{cluster_name}-iam-policy")
+
 
 # from pulumi_kubernetes.apps.v1 import Deployment
 
@@ -73,5 +95,8 @@ gke_nodepool_stack = GkeNodePoolStack(
 #     vpc=network_stack.vpc,
 #     vpc_peering=network_stack.vpc_peering,
 #     k8s_provider=gke_cluster_stack.k8s_provider,
-#     cluster_name=gke_cluster_stack.gke_cluster.name
+#     cluster_name=gke_cluster_stack.gke_cluster.name,
+#     capacity_plan=capacity_plan,
+#     domain=config.get("moodle_domain"),
+#     backend_http2=config.get_bool("moodle_backend_http2") or False
 # )
\ No newline at end of file
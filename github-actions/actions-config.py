@@ -1,6 +1,12 @@
+import os
+import sys
+
 import pulumi
 import pulumi_gcp as gcp
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gke.iam import IamPolicyBuilder
+
 # Define variables
 project_id = "spry-catcher-449515-h2"
 workload_pool_name = "githuboauth-pool"
@@ -64,21 +70,23 @@ roles = [
     "roles/compute.storageAdmin"
 ]
 
+# Collect all grants and write them to the project policy in a single update.
+# Stacks deployed with the former per-role IAMMember resources must drop those from the
+# state first (see README, "Migrating actions-config.py"), or their deletion revokes the grants.
+iam_policy = IamPolicyBuilder()
+
 # Assign IAM roles to the service account
 for role in roles:
-    gcp.projects.IAMMember(f"{service_account_name}-{role}",
-        project=project_id,
-        role=role,
-        member=f"serviceAccount:{service_account.email}"
-    )
+    iam_policy.add_service_account(role, service_account.email)
 
 # Bind Workload Identity Federation to the service account
-gcp.projects.IAMMember("workload-identity-binding",
-    project=project_id,
-    role="roles/iam.workloadIdentityUser",
-    member=f"principalSet://iam.googleapis.com/projects/{project_id}/locations/global/workloadIdentityPools/{workload_pool_name}/attribute.repository/{repo_name}"
+iam_policy.add(
+    "roles/iam.workloadIdentityUser",
+    f"principalSet://iam.googleapis.com/projects/{project_id}/locations/global/workloadIdentityPools/{workload_pool_name}/attribute.repository/{repo_name}"
 )
 
+iam_policy.apply(f"{service_account_name}-iam-policy", project=project_id)
+
 pulumi.export("workload_pool_id", workload_pool.id)
 pulumi.export("oidc_provider", oidc_provider.id)
 pulumi.export("service_account_email", service_account.email)
@@ -0,0 +1,183 @@
+"""Deploy driver for the test-pulumi project built on the Pulumi Automation API.
+
+Runs refresh, preview and (only if the preview reports changes) up against one stack
+in a single process, and reports how long each phase took. With --refresh-cache a
+preview runs first, and the refresh is limited to the resources it is about to update
+or replace plus the ones refresh_planner marks as stale; if anything was refreshed the
+preview is repeated against the refreshed state before deciding on `up`.
+
+    python github-actions/deploy.py --stack qcserestipy/test-pulumi/eks --parallel 16
+
+For offline runs point it at a local file backend, e.g.
+
+    PULUMI_CONFIG_PASSPHRASE=... python github-actions/deploy.py \
+        --stack dev --backend-url file://~/.pulumi-local --create-stack
+
+The stack must already exist unless --create-stack is given, so a mistyped stack name
+fails instead of deploying into a new empty stack.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from pulumi import automation as auto
+
+import refresh_planner
+
+PROJECT_NAME = "test-pulumi"
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def has_changes(change_summary: dict) -> bool:
+    """True if a preview change summary contains anything other than unchanged resources."""
+    return any(count for op, count in (change_summary or {}).items() if getattr(op, "value", op) != "same")
+
+
+def select_stack(stack_name: str, work_dir: str, backend_url: str = None, create: bool = False) -> auto.Stack:
+    env_vars = {}
+    if backend_url:
+        env_vars["PULUMI_BACKEND_URL"] = backend_url
+    select = auto.create_or_select_stack if create else auto.select_stack
+    return select(
+        stack_name=stack_name,
+        work_dir=work_dir,
+        opts=auto.LocalWorkspaceOptions(env_vars=env_vars),
+    )
+
+
+def stack_resources(stack: auto.Stack) -> list:
+    """Resources of the stack's current state as exported by `pulumi stack export`."""
+    return (stack.export_stack().deployment or {}).get("resources", [])
+
+
+def preview_pending(stack: auto.Stack, parallel: int) -> tuple:
+    """Run a preview and return (result, URNs it is about to update or replace)."""
+    steps = []
+
+    def collect(event):
+        if event.resource_pre_event is not None:
+            metadata = event.resource_pre_event.metadata
+            steps.append((metadata.op, metadata.urn))
+
+    result = stack.preview(parallel=parallel, on_output=print, on_event=collect)
+    return result, refresh_planner.pending_urns(steps)
+
+
+def targeted_refresh(
+    stack: auto.Stack, parallel: int, cache_path: str, ttl_seconds: int, pending: set = frozenset()
+) -> bool:
+    """Refresh the pending and stale resources, update the cache and return whether anything ran."""
+    cache = refresh_planner.load_cache(cache_path)
+    targets = refresh_planner.plan_refresh(stack_resources(stack), cache, ttl_seconds=ttl_seconds, pending=pending)
+    for urn, reason in sorted(targets.items()):
+        print(f"refresh {urn} ({reason})", flush=True)
+
+    if targets:
+        stack.refresh(parallel=parallel, target=list(targets), on_output=print)
+    else:
+        print("All resources fresh, skipping refresh", flush=True)
+
+    cache = refresh_planner.update_cache(cache, stack_resources(stack), targets)
+    refresh_planner.save_cache(cache_path, cache)
+    return bool(targets)
+
+
+def record_up(stack: auto.Stack, before: list, cache_path: str):
+    """Mark the resources `up` just wrote as fresh so the next run does not refresh them again."""
+    after = stack_resources(stack)
+    updated = refresh_planner.changed_urns(before, after)
+    cache = refresh_planner.update_cache(refresh_planner.load_cache(cache_path), after, updated)
+    refresh_planner.save_cache(cache_path, cache)
+
+
+def run(
+    stack_name: str,
+    parallel: int = 10,
+    work_dir: str = PROJECT_DIR,
+    backend_url: str = None,
+    create_stack: bool = False,
+    skip_refresh: bool = False,
+    preview_only: bool = False,
+    refresh_cache: str = None,
+    refresh_ttl: int = refresh_planner.DEFAULT_TTL_SECONDS,
+) -> dict:
+    """Run refresh/preview/up and return the per-phase timings in seconds."""
+    timings = {}
+
+    def phase(name, fn):
+        print(f"==> {name}", flush=True)
+        started = time.monotonic()
+        result = fn()
+        timings[name] = round(time.monotonic() - started, 2)
+        print(f"<== {name} took {timings[name]}s", flush=True)
+        return result
+
+    stack = phase("select", lambda: select_stack(stack_name, work_dir, backend_url, create_stack))
+
+    if refresh_cache and not skip_refresh:
+        # Refresh what this run is about to write, not only what the cache considers stale
+        preview, pending = phase("plan", lambda: preview_pending(stack, parallel))
+        if phase("refresh", lambda: targeted_refresh(stack, parallel, refresh_cache, refresh_ttl, pending)):
+            preview = phase("preview", lambda: stack.preview(parallel=parallel, on_output=print))
+    else:
+        if not skip_refresh:
+            phase("refresh", lambda: stack.refresh(parallel=parallel, on_output=print))
+        preview = phase("preview", lambda: stack.preview(parallel=parallel, on_output=print))
+    if preview_only:
+        return timings
+
+    if has_changes(preview.change_summary):
+        before = stack_resources(stack) if refresh_cache else None
+        phase("up", lambda: stack.up(parallel=parallel, on_output=print))
+        if refresh_cache:
+            record_up(stack, before, refresh_cache)
+    else:
+        print("No changes in preview, skipping up", flush=True)
+
+    return timings
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=f"Refresh, preview and deploy the {PROJECT_NAME} stack")
+    parser.add_argument("--stack", required=True, help="Fully qualified stack name, e.g. org/test-pulumi/eks")
+    parser.add_argument("--parallel", type=int, default=10, help="Resource operations run in parallel")
+    parser.add_argument("--work-dir", default=PROJECT_DIR, help="Directory containing Pulumi.yaml")
+    parser.add_argument("--backend-url", default=None, help="State backend, e.g. file://~/.pulumi-local")
+    parser.add_argument("--create-stack", action="store_true",
+                        help="Create the stack if it does not exist (e.g. on a local file backend)")
+    parser.add_argument("--skip-refresh", action="store_true", help="Do not refresh state before the preview")
+    parser.add_argument("--preview-only", action="store_true", help="Stop after the preview")
+    parser.add_argument("--refresh-cache", default=None,
+                        help="Fingerprint cache file; enables refreshing only stale resources")
+    parser.add_argument("--refresh-ttl", type=int, default=refresh_planner.DEFAULT_TTL_SECONDS,
+                        help="Seconds after which a cached resource is refreshed regardless")
+    parser.add_argument("--timings-file", default=None, help="Write the per-phase timings as JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        timings = run(
+            stack_name=args.stack,
+            parallel=args.parallel,
+            work_dir=args.work_dir,
+            backend_url=args.backend_url,
+            create_stack=args.create_stack,
+            skip_refresh=args.skip_refresh,
+            preview_only=args.preview_only,
+            refresh_cache=args.refresh_cache,
+            refresh_ttl=args.refresh_ttl,
+        )
+    except auto.CommandError as e:
+        print(f"Pulumi command failed: {e}", file=sys.stderr)
+        return 1
+
+    print(json.dumps(timings, indent=2))
+    if args.timings_file:
+        with open(args.timings_file, "w") as f:
+            json.dump(timings, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
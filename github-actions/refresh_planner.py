@@ -0,0 +1,112 @@
+"""Pick which resources of a stack actually need a `pulumi refresh`.
+
+A fingerprint cache (JSON, keyed by URN) remembers the hash of each resource's inputs
+and when it was last refreshed. A resource is refreshed when
+
+  * the preview of this run is about to update or replace it (see `pending_urns`),
+  * it is not in the cache yet,
+  * its inputs in the state no longer match the cached fingerprint, which only happens
+    when something other than deploy.py (e.g. a manual `pulumi up`) wrote it,
+  * its last refresh is older than the TTL, or
+  * its type drifts on its own (autoscaled node pools, Ingress status, HPA replicas).
+
+Everything else is assumed unchanged since the last refresh. Resources written by an
+`up` are recorded with their post-up fingerprint (see `changed_urns`), since `up` just
+read them back from the provider.
+"""
+import hashlib
+import json
+import os
+import time
+
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+
+# Resource types whose live state is changed by GCP/Kubernetes controllers, not by us
+DRIFT_PRONE_TYPES = {
+    "gcp:container/nodePool:NodePool",
+    "kubernetes:networking.k8s.io/v1:Ingress",
+    "kubernetes:autoscaling/v2:HorizontalPodAutoscaler",
+    "kubernetes:apps/v1:Deployment",
+}
+
+# Preview step operations that write an existing resource, so its live state must be current
+PENDING_OPS = {"update", "replace", "create-replacement", "delete-replaced"}
+
+# Bookkeeping resources that have nothing to refresh
+SKIPPED_TYPE_PREFIXES = ("pulumi:pulumi:Stack", "pulumi:providers:")
+
+
+def fingerprint(inputs: dict) -> str:
+    return hashlib.sha256(json.dumps(inputs or {}, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def load_cache(path: str) -> dict:
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_cache(path: str, cache: dict):
+    with open(path, "w") as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+
+
+def pending_urns(steps) -> set:
+    """URNs of the preview steps, given as (op, urn) pairs, that will write an existing resource."""
+    return {urn for op, urn in steps if getattr(op, "value", op) in PENDING_OPS}
+
+
+def plan_refresh(
+    resources: list,
+    cache: dict,
+    now: float = None,
+    ttl_seconds: int = DEFAULT_TTL_SECONDS,
+    drift_prone_types: set = DRIFT_PRONE_TYPES,
+    pending: set = frozenset(),
+) -> dict:
+    """Return {urn: reason} for every resource in the exported state that needs a refresh.
+
+    `pending` are the URNs a preview wants to update or replace (see `pending_urns`).
+    """
+    now = time.time() if now is None else now
+    targets = {}
+    for resource in resources:
+        urn, resource_type = resource["urn"], resource["type"]
+        if resource_type.startswith(SKIPPED_TYPE_PREFIXES):
+            continue
+        cached = cache.get(urn)
+        if urn in pending:
+            targets[urn] = "pending update"
+        elif cached is None:
+            targets[urn] = "new"
+        elif cached["fingerprint"] != fingerprint(resource.get("inputs")):
+            targets[urn] = "inputs changed"
+        elif now - cached["refreshed_at"] >= ttl_seconds:
+            targets[urn] = "ttl expired"
+        elif resource_type in drift_prone_types:
+            targets[urn] = "drift-prone"
+    return targets
+
+
+def changed_urns(before: list, after: list) -> set:
+    """URNs that are new in `after` or whose inputs differ from `before` (e.g. across an `up`)."""
+    previous = {resource["urn"]: fingerprint(resource.get("inputs")) for resource in before}
+    return {
+        resource["urn"] for resource in after
+        if previous.get(resource["urn"]) != fingerprint(resource.get("inputs"))
+    }
+
+
+def update_cache(cache: dict, resources: list, refreshed_urns, now: float = None) -> dict:
+    """Record fresh fingerprints for the refreshed resources and drop URNs no longer in the state."""
+    now = time.time() if now is None else now
+    refreshed_urns = set(refreshed_urns)
+    current = {resource["urn"]: resource for resource in resources}
+    updated = {urn: entry for urn, entry in cache.items() if urn in current}
+    for urn in refreshed_urns & current.keys():
+        updated[urn] = {
+            "fingerprint": fingerprint(current[urn].get("inputs")),
+            "refreshed_at": now,
+        }
+    return updated
@@ -1,4 +1,77 @@
 import pulumi_gcp as gcp
+from gke.iam import IamPolicyBuilder
+
+# Tool versions baked into / installed on the bastion. Pinned so every boot is identical.
+KUBECTL_VERSION = "v1.31.4"
+KREW_VERSION = "v0.4.4"
+KREW_PLUGINS = ("ns", "ctx")
+
+# Guest attribute namespace the startup script reports its progress under
+READINESS_NAMESPACE = "bastion"
+
+
+def render_startup_script(
+    kubectl_version: str = KUBECTL_VERSION,
+    krew_version: str = KREW_VERSION,
+    krew_plugins: tuple = KREW_PLUGINS,
+    install_tools: bool = True,
+    report_readiness: bool = True,
+) -> str:
+    """Render the bastion startup script.
+
+    With `install_tools` the script installs gcloud, kubectl and krew at the pinned versions;
+    this is also the script used to bake a bastion image. On a pre-baked image the tools are
+    already there and the script only reports readiness. Readiness goes to the guest
+    attribute `<READINESS_NAMESPACE>/status` (`booting` -> `ready` or `failed`).
+    """
+    lines = ["#!/bin/bash", "set -euo pipefail", ""]
+    if report_readiness:
+        lines += [
+            "report() {",
+            "    curl -s -X PUT --data \"$2\" -H \"Metadata-Flavor: Google\" \\",
+            f"        \"http://metadata.google.internal/computeMetadata/v1/instance/guest-attributes/{READINESS_NAMESPACE}/$1\" || true",
+            "}",
+            "trap 'report status failed' ERR",
+            "report status booting",
+            "",
+        ]
+    if install_tools:
+        krew_arch = "linux_amd64"
+        lines += [
+            "# Install necessary packages including Tinyproxy",
+            "apt-get update",
+            "apt-get install -y --no-install-recommends google-cloud-sdk tinyproxy google-cloud-cli-gke-gcloud-auth-plugin git curl",
+            "",
+            f"curl -fsSLo /tmp/kubectl \"https://dl.k8s.io/release/{kubectl_version}/bin/linux/amd64/kubectl\"",
+            "install -o root -g root -m 0755 /tmp/kubectl /usr/local/bin/kubectl",
+            "",
+            "# krew and its plugins live in a system-wide root so every user gets them",
+            "export KREW_ROOT=/opt/krew",
+            "cd \"$(mktemp -d)\"",
+            f"curl -fsSLO \"https://github.com/kubernetes-sigs/krew/releases/download/{krew_version}/krew-{krew_arch}.tar.gz\"",
+            f"tar zxf \"krew-{krew_arch}.tar.gz\"",
+            f"./krew-{krew_arch} install krew",
+            f"PATH=\"$KREW_ROOT/bin:$PATH\" kubectl krew install {' '.join(krew_plugins)}",
+            "chmod -R a+rX \"$KREW_ROOT\"",
+            "",
+            "cat > /etc/profile.d/bastion.sh <<'PROFILE'",
+            "export KREW_ROOT=/opt/krew",
+            "export PATH=\"$KREW_ROOT/bin:$PATH\"",
+            "alias kns=\"kubectl ns\"",
+            "alias kctx=\"kubectl ctx\"",
+            "alias k=\"kubectl\"",
+            "source <(kubectl completion bash)",
+            "complete -F __start_kubectl k",
+            "PROFILE",
+            "",
+        ]
+    if report_readiness:
+        lines += [
+            "report kubectl \"$(kubectl version --client -o json | grep -m1 gitVersion | cut -d'\"' -f4)\"",
+            "report status ready",
+        ]
+    return "\n".join(lines) + "\n"
+
 
 class GkeBastionHostStack:
     def __init__(
@@ -9,6 +82,9 @@ class GkeBastionHostStack:
         name: str = "gke-bastion-host", 
         machine_type: str = "e2-micro",
         image: str = "debian-cloud/debian-11",
+        iam_policy: IamPolicyBuilder = None,
+        prebaked_image: str = None,
+        use_mig: bool = False,
     ):
 
         # This bastion host is implemented according to:
@@ -25,75 +101,137 @@ class GkeBastionHostStack:
         )
 
         # Grant roles to the service account
-        self.viewer_role_binding = gcp.projects.IAMMember(
-            f"{name}-viewer-role-binding",
-            project=gcp.config.project,
-            role="roles/container.clusterViewer",  # Allows viewing cluster details
-            member=self.service_account.email.apply(lambda email: f"serviceAccount:{email}"),
-        )
+        bastion_roles = [
+            "roles/container.clusterViewer",  # Allows viewing cluster details
+            "roles/container.admin",  # Allows administrative access to the cluster
+        ]
+        if iam_policy is not None:
+            # Collected into the shared project policy, written once by the caller
+            for role in bastion_roles:
+                iam_policy.add_service_account(role, self.service_account.email)
+        else:
+            self.viewer_role_binding = gcp.projects.IAMMember(
+                f"{name}-viewer-role-binding",
+                project=gcp.config.project,
+                role=bastion_roles[0],
+                member=self.service_account.email.apply(lambda email: f"serviceAccount:{email}"),
+            )
+
+            self.admin_role_binding = gcp.projects.IAMMember(
+                f"{name}-admin-role-binding",
+                project=gcp.config.project,
+                role=bastion_roles[1],
+                member=self.service_account.email.apply(lambda email: f"serviceAccount:{email}"),
+            )
 
-        self.admin_role_binding = gcp.projects.IAMMember(
-            f"{name}-admin-role-binding",
-            project=gcp.config.project,
-            role="roles/container.admin",  # Allows administrative access to the cluster
-            member=self.service_account.email.apply(lambda email: f"serviceAccount:{email}"),
-        )        
-
-        # Create the bastion host and associate the service account
-        self.bastion_host = gcp.compute.Instance(
-            name,
-            zone=f"{region}-a",
-            machine_type=machine_type,
-            boot_disk=gcp.compute.InstanceBootDiskArgs(
-                initialize_params=gcp.compute.InstanceBootDiskInitializeParamsArgs(
-                    image=image,
+        # With a pre-baked image the tools are already installed and the boot only reports
+        # readiness; on a stock image everything is installed on first boot.
+        startup_script = render_startup_script(install_tools=prebaked_image is None)
+        boot_image = prebaked_image or image
+        metadata = {"enable-guest-attributes": "TRUE"}
+
+        if use_mig:
+            # Instance template + single-instance MIG: the MIG recreates the bastion from the
+            # template when the SSH health check fails, instead of waiting for a manual replace.
+            self.instance_template = gcp.compute.InstanceTemplate(
+                f"{name}-template",
+                name_prefix=f"{name}-",
+                machine_type=machine_type,
+                disks=[
+                    gcp.compute.InstanceTemplateDiskArgs(
+                        source_image=boot_image,
+                        boot=True,
+                        auto_delete=True,
+                    )
+                ],
+                network_interfaces=[
+                    gcp.compute.InstanceTemplateNetworkInterfaceArgs(
+                        network=vpc_id,
+                        subnetwork=private_subnet_id,
+                    )
+                ],
+                service_account=gcp.compute.InstanceTemplateServiceAccountArgs(
+                    email=self.service_account.email,
+                    scopes=["https://www.googleapis.com/auth/cloud-platform"]
                 ),
-            ),
-            network_interfaces=[
-                gcp.compute.InstanceNetworkInterfaceArgs(
-                    network=vpc_id,
-                    subnetwork=private_subnet_id,
-                    access_configs=[],  # No external IP (no access config)
-                )
-            ],
-            service_account=gcp.compute.InstanceServiceAccountArgs(
-                email=self.service_account.email,
-                scopes=["https://www.googleapis.com/auth/cloud-platform"]
-            ),
-            metadata_startup_script="""
-                #!/bin/bash
-                # Install necessary packages including Tinyproxy
-                sudo apt-get update
-                sudo apt-get install -y google-cloud-sdk tinyproxy google-cloud-cli-gke-gcloud-auth-plugin git
-                   
-                curl -LO "https://dl.k8s.io/release/$(curl -L -s https://dl.k8s.io/release/stable.txt)/bin/linux/amd64/kubectl"
-                sudo install -o root -g root -m 0755 kubectl /usr/local/bin/kubectl                
-                # gcloud container clusters get-credentials yukaringermany-gke --region europe-west10 --project "yukaringermany-gke"
-                cd "$(mktemp -d)" \
-                    && OS="$(uname | tr '[:upper:]' '[:lower:]')" \
-                    && ARCH="$(uname -m | sed -e 's/x86_64/amd64/' -e 's/\(arm\)\(64\)\?.*/\1\2/' -e 's/aarch64$/arm64/')" \
-                    && KREW="krew-${OS}_${ARCH}" \
-                    && curl -fsSLO "https://github.com/kubernetes-sigs/krew/releases/latest/download/${KREW}.tar.gz" \
-                    && tar zxvf "${KREW}.tar.gz" \
-                    && ./"${KREW}" install krew
-                echo 'export PATH="${KREW_ROOT:-$HOME/.krew}/bin:$PATH"' >> ~/.bashrc
-                source ~/.bashrc 
-                kubectl krew install ns ctx
-                echo 'alias kns="kubectl ns"' >> ~/.bashrc
-                echo 'alias kctx="kubectl ctx"' >> ~/.bashrc
-                echo 'alias k="kubectl"' >> ~/.bashrc
-                echo 'source <(kubectl completion bash)' >> ~/.bashrc
-                echo 'complete -F __start_kubectl k' >> ~/.bashrc
-
-                # # Configure Tinyproxy
-                # sudo sed -i 's/^Port .*/Port 8888/' /etc/tinyproxy/tinyproxy.conf  # Ensure port 8888
-                # sudo sed -i '/^#Allow 127.0.0.1/a Allow localhost' /etc/tinyproxy/tinyproxy.conf  # Add Allow localhost
-
-                # # Restart Tinyproxy service
-                # sudo service tinyproxy restart
-            """,
-            tags=[bastion_host_tag],
-        )
+                metadata=metadata,
+                metadata_startup_script=startup_script,
+                tags=[bastion_host_tag],
+            )
+
+            self.health_check = gcp.compute.HealthCheck(
+                f"{name}-ssh-health-check",
+                check_interval_sec=10,
+                timeout_sec=5,
+                healthy_threshold=2,
+                unhealthy_threshold=3,
+                tcp_health_check=gcp.compute.HealthCheckTcpHealthCheckArgs(
+                    port=22,
+                ),
+            )
+
+            self.instance_group = gcp.compute.InstanceGroupManager(
+                f"{name}-mig",
+                zone=f"{region}-a",
+                base_instance_name=name,
+                target_size=1,
+                versions=[
+                    gcp.compute.InstanceGroupManagerVersionArgs(
+                        instance_template=self.instance_template.self_link_unique,
+                    )
+                ],
+                auto_healing_policies=gcp.compute.InstanceGroupManagerAutoHealingPoliciesArgs(
+                    health_check=self.health_check.id,
+                    initial_delay_sec=60 if prebaked_image else 300,
+                ),
+                update_policy=gcp.compute.InstanceGroupManagerUpdatePolicyArgs(
+                    type="PROACTIVE",
+                    minimal_action="REPLACE",
+                    max_surge_fixed=1,
+                    max_unavailable_fixed=0,
+                ),
+            )
+
+            self.health_check_firewall_rule = gcp.compute.Firewall(
+                f"{name}-allow-health-check",
+                network=vpc_id,
+                allows=[
+                    gcp.compute.FirewallAllowArgs(
+                        protocol="tcp",
+                        ports=["22"],
+                    ),
+                ],
+                direction="INGRESS",
+                source_ranges=["35.191.0.0/16", "130.211.0.0/22"],  # Google health checkers
+                target_tags=[bastion_host_tag],
+                description="Allow health checks for bastion autohealing",
+            )
+        else:
+            # Create the bastion host and associate the service account
+            self.bastion_host = gcp.compute.Instance(
+                name,
+                zone=f"{region}-a",
+                machine_type=machine_type,
+                boot_disk=gcp.compute.InstanceBootDiskArgs(
+                    initialize_params=gcp.compute.InstanceBootDiskInitializeParamsArgs(
+                        image=boot_image,
+                    ),
+                ),
+                network_interfaces=[
+                    gcp.compute.InstanceNetworkInterfaceArgs(
+                        network=vpc_id,
+                        subnetwork=private_subnet_id,
+                        access_configs=[],  # No external IP (no access config)
+                    )
+                ],
+                service_account=gcp.compute.InstanceServiceAccountArgs(
+                    email=self.service_account.email,
+                    scopes=["https://www.googleapis.com/auth/cloud-platform"]
+                ),
+                metadata=metadata,
+                metadata_startup_script=startup_script,
+                tags=[bastion_host_tag],
+            )
 
         self.iap_firewall_rule = gcp.compute.Firewall(
             f"{name}-allow-ingress-from-iap",
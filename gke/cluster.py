@@ -1,6 +1,16 @@
 import pulumi
 from pulumi_gcp import container, compute, config as gcp_config
 import pulumi_kubernetes as k8s
+from gke.stack_reference import own_stack_reference
+
+def render_mode_allowed(previous_mode: str, previous_cluster_name: str) -> bool:
+    """Render mode is safe only on a fresh stack or one whose last update was in render mode.
+
+    Stacks deployed before `k8sProviderMode` was exported have no mode but do have a
+    `clusterName`; they are treated as live.
+    """
+    return previous_mode == "render" or (previous_mode is None and previous_cluster_name is None)
+
 
 class GkeClusterStack:
     def __init__(
@@ -9,7 +19,8 @@ class GkeClusterStack:
         region: str, 
         vpc_id: str, 
         private_subnet: compute.Subnetwork,
-        gke_version: str
+        gke_version: str,
+        render_yaml_to_directory: str = None,
     ):
         self.gke_cluster = container.Cluster(
             f"{name}-cluster",
@@ -43,9 +54,45 @@ class GkeClusterStack:
             ),
         )
 
-        # Create the Kubernetes provider using the kubeconfig
-        self.k8s_provider = k8s.Provider(f"{name}-provider", kubeconfig=self.generate_kubeconfig())
+        # Create the Kubernetes provider using the kubeconfig.
+        # In render mode every Kubernetes object is written as YAML to the given directory
+        # instead of being sent to the cluster, so previews need no reachable API server and
+        # the manifests can be diffed and reviewed offline. In live mode objects are applied
+        # server-side, which lets the API server compute the diffs.
+        #
+        # Render mode is for dedicated stacks only: moving existing objects to the render
+        # provider replaces them, i.e. deletes them from the cluster. The mode is exported and
+        # render mode only runs on a stack that was never deployed or was last deployed in
+        # render mode (see render_mode_allowed).
+        provider_mode = "render" if render_yaml_to_directory else "live"
+        if render_yaml_to_directory:
+            own_stack = own_stack_reference(f"{name}-previous-k8s-mode")
+
+            def check_render_allowed(args):
+                if not render_mode_allowed(*args):
+                    raise ValueError(
+                        f"Stack {pulumi.get_stack()} was deployed before and not in render mode, so it may hold "
+                        "live Kubernetes objects that render mode would delete from the cluster. "
+                        "Use a dedicated stack for render_yaml_to_directory."
+                    )
+                return render_yaml_to_directory
+
+            previous = pulumi.Output.all(
+                own_stack.get_output("k8sProviderMode"),
+                own_stack.get_output("clusterName"),
+            )
+            self.k8s_provider = k8s.Provider(
+                f"{name}-render-provider",
+                render_yaml_to_directory=previous.apply(check_render_allowed),
+            )
+        else:
+            self.k8s_provider = k8s.Provider(
+                f"{name}-provider",
+                kubeconfig=self.generate_kubeconfig(),
+                enable_server_side_apply=True,
+            )
 
+        pulumi.export("k8sProviderMode", provider_mode)
         pulumi.export("clusterName", self.gke_cluster.name)
         pulumi.export("clusterEndpoint", self.gke_cluster.endpoint)
         pulumi.export("debugMasterAuth", self.gke_cluster.master_auth)
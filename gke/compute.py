@@ -1,4 +1,5 @@
 import pulumi_gcp as gcp
+from gke.sizing import CapacityPlan
 
 class GkeNodePoolStack:
     def __init__(
@@ -7,17 +8,27 @@ class GkeNodePoolStack:
         region: str,
         cluster_name: str,
         preemtible: bool = True,
-        machine_type: str = "n1-standard-1"
+        machine_type: str = "n1-standard-1",
+        capacity_plan: CapacityPlan = None,
     ):
+
+        # Without a capacity plan keep the fixed single-node pool
+        min_node_count, max_node_count = 1, 1
+        if capacity_plan is not None:
+            machine_type = capacity_plan.node_pool.machine_type
+            min_node_count = capacity_plan.node_pool.min_node_count
+            max_node_count = capacity_plan.node_pool.max_node_count
     
         self.node_pool = gcp.container.NodePool(
             resource_name=f"{name}-node-pool",
             location=region,
             cluster=cluster_name,
+            # initial_node_count forces a new node pool when it changes, so it stays fixed;
+            # only the autoscaling bounds follow the capacity plan
             initial_node_count=1,
             autoscaling=gcp.container.ClusterNodePoolAutoscalingArgs(
-                min_node_count=1,
-                max_node_count=1,
+                min_node_count=min_node_count,
+                max_node_count=max_node_count,
             ),
             node_config=gcp.container.ClusterNodeConfigArgs(
                 machine_type=machine_type,
@@ -30,4 +41,4 @@ class GkeNodePoolStack:
                     'https://www.googleapis.com/auth/monitoring'
                 ],
             ),
-        )
\ No newline at end of file
+        )
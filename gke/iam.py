@@ -0,0 +1,130 @@
+import json
+
+import pulumi
+import pulumi_gcp as gcp
+from pulumi import ResourceOptions
+from gke.stack_reference import own_stack_reference
+
+# ---------------------------------------------------------------------------------------
+# Binding collapsing and diffing (plain data, no Pulumi involved)
+# ---------------------------------------------------------------------------------------
+# A policy is represented as {role: [member, ...]} with members sorted and unique.
+
+
+def collapse_bindings(pairs) -> dict:
+    """Collapse (role, member) pairs into one sorted, de-duplicated binding per role."""
+    bindings = {}
+    for role, member in pairs:
+        bindings.setdefault(role, set()).add(member)
+    return {role: sorted(members) for role, members in sorted(bindings.items())}
+
+
+def diff_bindings(current: dict, desired: dict) -> tuple:
+    """Return (additions, removals) needed to turn `current` into `desired`, both as {role: [member]}."""
+    additions, removals = {}, {}
+    for role in sorted(set(current) | set(desired)):
+        have, want = set(current.get(role, [])), set(desired.get(role, []))
+        if want - have:
+            additions[role] = sorted(want - have)
+        if have - want:
+            removals[role] = sorted(have - want)
+    return additions, removals
+
+
+def policy_bindings(policy: dict) -> dict:
+    """Unconditional bindings of a policy document as {role: [member]}."""
+    return {
+        binding["role"]: sorted(binding.get("members", []))
+        for binding in policy.get("bindings", []) if "condition" not in binding
+    }
+
+
+def merge_policy(policy: dict, desired: dict, previous: dict = None) -> dict:
+    """Merge the desired bindings into a project IAM policy document.
+
+    Bindings owned by others are kept as they are. Members listed in `previous` (what this
+    program managed on its last run) but no longer desired are removed. Conditional
+    bindings are never touched. The policy's `etag` is kept, so the write is rejected if
+    the policy changed since it was read instead of silently overwriting that change.
+    """
+    _, removals = diff_bindings(previous or {}, desired)
+    merged, seen = [], set()
+    for binding in policy.get("bindings", []):
+        role = binding["role"]
+        if "condition" in binding:
+            merged.append(binding)
+            continue
+        seen.add(role)
+        members = (set(binding.get("members", [])) - set(removals.get(role, []))) | set(desired.get(role, []))
+        if members:
+            merged.append({"role": role, "members": sorted(members)})
+    for role in sorted(set(desired) - seen):
+        merged.append({"role": role, "members": list(desired[role])})
+
+    result = {key: value for key, value in policy.items() if key != "bindings"}
+    result["bindings"] = sorted(merged, key=lambda b: (b["role"], "condition" in b))
+    return result
+
+
+# ---------------------------------------------------------------------------------------
+# Pulumi side
+# ---------------------------------------------------------------------------------------
+class IamPolicyBuilder:
+    """Collects project IAM grants from several components and writes them as one policy.
+
+    Every `gcp.projects.IAMMember` is its own read-modify-write of the project policy, and
+    those writes serialize on the policy etag. Components call `add()` instead and a single
+    `apply()` writes all grants with one `gcp.projects.IAMPolicy`.
+    """
+
+    def __init__(self):
+        self.pairs = []
+
+    def add(self, role: str, member):
+        """Grant `role` to `member` (a string or an Output of one, e.g. "serviceAccount:...")."""
+        self.pairs.append((role, member))
+
+    def add_service_account(self, role: str, email):
+        self.add(role, pulumi.Output.from_input(email).apply(lambda e: f"serviceAccount:{e}"))
+
+    def bindings(self) -> pulumi.Output:
+        """Desired bindings as {role: [member]} once all member Outputs are known."""
+        roles = [role for role, _ in self.pairs]
+        return pulumi.Output.all(*[member for _, member in self.pairs]).apply(
+            lambda members: collapse_bindings(zip(roles, members))
+        )
+
+    def apply(self, name: str, project: str = None, previous: dict = None, opts: ResourceOptions = None):
+        """Write all collected grants to the project with a single IAMPolicy resource.
+
+        The live policy is read first and merged, so bindings managed elsewhere survive.
+        Grants this program made on its last run (the `<name>-bindings` stack output, or
+        `previous` if given) that are no longer collected are revoked.
+        The resource is retained on delete: dropping it must never wipe the project policy.
+        """
+        project = project or gcp.config.project
+        current = gcp.projects.get_iam_policy_output(project=project)
+        output_name = f"{name}-bindings"
+        if previous is None:
+            # The bindings this stack exported on its last successful update
+            previous = own_stack_reference(f"{name}-previous").get_output(output_name)
+
+        def merge(args):
+            policy_data, desired, managed = args
+            policy = json.loads(policy_data) if policy_data else {}
+            additions, _ = diff_bindings(policy_bindings(policy), desired)
+            _, removals = diff_bindings(managed or {}, desired)
+            if additions:
+                pulumi.log.info(f"IAM policy {name}: adding {additions}")
+            if removals:
+                pulumi.log.info(f"IAM policy {name}: revoking {removals}")
+            return json.dumps(merge_policy(policy, desired, managed), sort_keys=True)
+
+        self.policy = gcp.projects.IAMPolicy(
+            name,
+            project=project,
+            policy_data=pulumi.Output.all(current.policy_data, self.bindings(), previous).apply(merge),
+            opts=ResourceOptions.merge(ResourceOptions(retain_on_delete=True), opts),
+        )
+        pulumi.export(output_name, self.bindings())
+        return self.policy
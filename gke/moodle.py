@@ -2,6 +2,7 @@ import pulumi
 import pulumi_gcp as gcp
 import pulumi_kubernetes as k8s
 from pulumi import ResourceOptions
+from gke.sizing import CapacityPlan, plan_capacity
 
 class MoodleStack:
     def __init__(
@@ -12,8 +13,15 @@ class MoodleStack:
         vpc_peering,
         k8s_provider: k8s.Provider,
         cluster_name: pulumi.Output[str],
+        capacity_plan: CapacityPlan = None,
+        domain: str = None,
+        backend_http2: bool = False,
     ):
 
+        # All tiers, sizes and replica ranges below come from the capacity plan
+        if capacity_plan is None:
+            capacity_plan = plan_capacity()
+
         # ---------------------------------------------------------------------------------------
         # 1) Cloud Filestore (NFS) for moodledata
         # ---------------------------------------------------------------------------------------
@@ -21,11 +29,11 @@ class MoodleStack:
         # Adjust `reserved_ip_range` capacity as you need.
         self.moodle_filestore = gcp.filestore.Instance(
             f"{name}-filestore",
-            tier="BASIC_HDD",
+            tier=capacity_plan.filestore.tier,
             location=f"{region}-a",
             file_shares={
                 "name": "moodle",
-                "capacityGb": 1024,
+                "capacityGb": capacity_plan.filestore.capacity_gb,
             },
             networks=[
                 gcp.filestore.InstanceNetworkArgs(
@@ -43,7 +51,7 @@ class MoodleStack:
         self.moodle_redis = gcp.redis.Instance(
             f"{name}-redis",
             tier="STANDARD_HA",
-            memory_size_gb=1,
+            memory_size_gb=capacity_plan.redis.memory_size_gb,
             region=region,
             redis_version="REDIS_7_2",
             transit_encryption_mode="SERVER_AUTHENTICATION",  # Optional, for TLS
@@ -58,7 +66,13 @@ class MoodleStack:
             database_version="MYSQL_8_0",
             region=region,
             settings={
-                "tier": "db-n1-standard-1",
+                "tier": capacity_plan.database.tier,
+                "database_flags": [
+                    {
+                        "name": "max_connections",
+                        "value": str(capacity_plan.database.max_connections),
+                    },
+                ],
                 "ip_configuration": {
                     "ipv4_enabled": False,
                     "private_network": vpc.self_link,
@@ -111,7 +125,8 @@ class MoodleStack:
                 "labels": {"app": "moodle"},
             },
             spec={
-                "replicas": 2,
+                # No "replicas": the HPA below owns the replica count, setting it here would
+                # reset every scale-up on the next `pulumi up`
                 "selector": {
                     "matchLabels": {"app": "moodle"}
                 },
@@ -124,7 +139,16 @@ class MoodleStack:
                             {
                                 "name": "moodle",
                                 "image": "bitnami/moodle:latest",  # or another Moodle container
-                                "ports": [{"containerPort": 80, "name": "http"}],
+                                "ports": [
+                                    {"containerPort": 80, "name": "http"},
+                                    {"containerPort": 8443, "name": "https"},
+                                ],
+                                "resources": {
+                                    "requests": {
+                                        "cpu": capacity_plan.moodle.cpu_request,
+                                        "memory": capacity_plan.moodle.memory_request,
+                                    },
+                                },
                                 "env": [
                                     {
                                         "name": "MOODLE_DATABASE_HOST",
@@ -176,24 +200,56 @@ class MoodleStack:
             opts=ResourceOptions(provider=k8s_provider),
         )
 
+        # Scale Moodle between the planned replica bounds on CPU utilisation
+        self.moodle_hpa = k8s.autoscaling.v2.HorizontalPodAutoscaler(
+            f"{name}-hpa",
+            metadata={
+                "name": "moodle-hpa",
+                "namespace": self.moodle_ns.metadata["name"],
+                "labels": {"app": "moodle"},
+            },
+            spec={
+                "scaleTargetRef": {
+                    "apiVersion": "apps/v1",
+                    "kind": "Deployment",
+                    "name": self.moodle_deployment.metadata["name"],
+                },
+                "minReplicas": capacity_plan.moodle.min_replicas,
+                "maxReplicas": capacity_plan.moodle.max_replicas,
+                "metrics": [
+                    {
+                        "type": "Resource",
+                        "resource": {
+                            "name": "cpu",
+                            "target": {
+                                "type": "Utilization",
+                                "averageUtilization": capacity_plan.moodle.target_cpu_utilization,
+                            },
+                        },
+                    }
+                ],
+            },
+            opts=ResourceOptions(provider=k8s_provider),
+        )
+
         # Expose Moodle via a Kubernetes Service (NodePort or ClusterIP)
+        # With backend_http2 the load balancer talks HTTP/2 (over TLS) to the pods,
+        # otherwise plain HTTP/1.1 on port 80.
+        service_port = {"name": "https", "port": 443, "targetPort": "https"} if backend_http2 \
+            else {"name": "http", "port": 80, "targetPort": "http"}
+        service_annotations = {"cloud.google.com/app-protocols": '{"https":"HTTP2"}'} if backend_http2 else {}
         self.moodle_service = k8s.core.v1.Service(
             f"{name}-service",
             metadata={
                 "name": "moodle-service",
                 "namespace": self.moodle_ns.metadata["name"],
                 "labels": {"app": "moodle"},
+                "annotations": service_annotations,
             },
             spec={
                 "type": "NodePort",
                 "selector": {"app": "moodle"},
-                "ports": [
-                    {
-                        "name": "http",
-                        "port": 80,
-                        "targetPort": "http",
-                    }
-                ],
+                "ports": [service_port],
             },
             opts=ResourceOptions(provider=k8s_provider),
         )
@@ -234,21 +290,78 @@ class MoodleStack:
             opts=ResourceOptions(provider=k8s_provider),
         )
 
-        # (c) Create the Ingress with relevant annotations
+        # (c) Reserve a global static IP so the frontend address survives Ingress re-creation
+        self.moodle_static_ip = gcp.compute.GlobalAddress(
+            f"{name}-static-ip",
+            address_type="EXTERNAL",
+            ip_version="IPV4",
+            description="Static frontend IP for the Moodle Ingress",
+        )
+
+        # (d) Google-managed certificate for the Moodle domain. Without a domain there is
+        #     nothing to certify, so the frontend stays HTTP-only.
+        ingress_annotations = {
+            "kubernetes.io/ingress.class": "gce",
+            # Attach to the custom BackendConfig we created
+            "cloud.google.com/backend-config": '{"default":"moodle-backendconfig"}',
+            "kubernetes.io/ingress.global-static-ip-name": self.moodle_static_ip.name,
+            "networking.gke.io/v1beta1.FrontendConfig": "moodle-frontendconfig",
+        }
+        self.managed_certificate = None
+        if domain:
+            self.managed_certificate = k8s.apiextensions.CustomResource(
+                f"{name}-managed-cert",
+                api_version="networking.gke.io/v1",
+                kind="ManagedCertificate",
+                metadata={
+                    "name": "moodle-managed-cert",
+                    "namespace": self.moodle_ns.metadata["name"],
+                },
+                spec={
+                    "domains": [domain],
+                },
+                opts=ResourceOptions(provider=k8s_provider),
+            )
+            ingress_annotations["networking.gke.io/managed-certificates"] = "moodle-managed-cert"
+        else:
+            pulumi.log.warn("MoodleStack: no domain given, skipping managed certificate and HTTPS redirect")
+
+        # (e) SSL policy and FrontendConfig: TLS 1.2+ with modern ciphers, HTTP -> HTTPS redirect.
+        #     QUIC/HTTP/3 is NOT enabled here: the Ingress controller creates and owns the target
+        #     HTTPS proxy and neither FrontendConfig nor any Ingress annotation sets its
+        #     quicOverride, which stays at the default NONE (not ENABLE).
+        self.ssl_policy = gcp.compute.SSLPolicy(
+            f"{name}-ssl-policy",
+            profile="MODERN",
+            min_tls_version="TLS_1_2",
+            description="TLS policy for the Moodle HTTPS frontend",
+        )
+
+        self.frontend_config = k8s.apiextensions.CustomResource(
+            f"{name}-frontendconfig",
+            api_version="networking.gke.io/v1beta1",
+            kind="FrontendConfig",
+            metadata={
+                "name": "moodle-frontendconfig",
+                "namespace": self.moodle_ns.metadata["name"],
+            },
+            spec={
+                "sslPolicy": self.ssl_policy.name,
+                "redirectToHttps": {
+                    "enabled": bool(domain),
+                    "responseCodeName": "MOVED_PERMANENTLY_DEFAULT",
+                },
+            },
+            opts=ResourceOptions(provider=k8s_provider),
+        )
+
+        # (f) Create the Ingress with relevant annotations
         self.moodle_ingress = k8s.networking.v1.Ingress(
             f"{name}-ingress",
             metadata={
                 "name": "moodle-ingress",
                 "namespace": self.moodle_ns.metadata["name"],
-                "annotations": {
-                    "kubernetes.io/ingress.class": "gce",
-                    # Attach to the custom BackendConfig we created
-                    "cloud.google.com/backend-config": '{"default":"moodle-backendconfig"}',
-                    # For example if you have a Global Static IP
-                    # "kubernetes.io/ingress.global-static-ip-name": "moodle-static-ip",
-                    # If you have an existing managed SSL cert
-                    # "ingress.gcp.kubernetes.io/pre-shared-cert": "moodle-ssl-cert",
-                },
+                "annotations": ingress_annotations,
             },
             spec={
                 "rules": [
@@ -262,7 +375,7 @@ class MoodleStack:
                                         "service": {
                                             "name": self.moodle_service.metadata["name"],
                                             "port": {
-                                                "number": 80
+                                                "number": service_port["port"]
                                             },
                                         }
                                     },
@@ -272,7 +385,10 @@ class MoodleStack:
                     }
                 ]
             },
-            opts=ResourceOptions(provider=k8s_provider),
+            opts=ResourceOptions(
+                provider=k8s_provider,
+                depends_on=[self.frontend_config] + ([self.managed_certificate] if self.managed_certificate else []),
+            ),
         )
 
         # ---------------------------------------------------------------------------------------
@@ -295,8 +411,7 @@ class MoodleStack:
         pulumi.export("redisHost", redis_host)
         pulumi.export("redisPort", redis_port)
         pulumi.export("dbConnectionName", db_conn_name)
-        pulumi.export("moodleURL", self.moodle_ingress.status.apply(
-            lambda s: f"http://{s.load_balancer.ingress[0].ip}" 
-            if s and s.load_balancer and s.load_balancer.ingress 
-            else "Provisioning..."
+        pulumi.export("moodleStaticIP", self.moodle_static_ip.address)
+        pulumi.export("moodleURL", f"https://{domain}" if domain else self.moodle_static_ip.address.apply(
+            lambda ip: f"http://{ip}"
         ))
@@ -0,0 +1,228 @@
+import math
+from dataclasses import dataclass
+
+# ---------------------------------------------------------------------------------------
+# Capacity model inputs
+# ---------------------------------------------------------------------------------------
+# Per-activity load generated by one active user. Numbers are rough Moodle figures:
+#   rps           - requests per second a single active user generates
+#   cpu_ms        - CPU time (ms) one request costs on the web tier
+#   db_queries    - DB queries per request
+#   file_ops      - Filestore (moodledata) operations per request
+WORKLOAD_PROFILES = {
+    "browse": {"rps": 0.10, "cpu_ms": 60, "db_queries": 25, "file_ops": 0.2},
+    "quiz": {"rps": 0.20, "cpu_ms": 120, "db_queries": 60, "file_ops": 0.1},
+    "forum": {"rps": 0.08, "cpu_ms": 80, "db_queries": 40, "file_ops": 0.1},
+    "upload": {"rps": 0.02, "cpu_ms": 250, "db_queries": 20, "file_ops": 4.0},
+}
+
+DEFAULT_WORKLOAD_MIX = {"browse": 0.6, "quiz": 0.2, "forum": 0.15, "upload": 0.05}
+
+# GKE machine types as (name, allocatable CPU millicores, allocatable memory MiB), smallest
+# first. Allocatable is what GKE leaves for pods after kubelet/OS reservations and the
+# eviction threshold; the shared-core e2-small/e2-medium only get 940m.
+NODE_MACHINE_TYPES = [
+    ("e2-small", 940, 1436),
+    ("e2-medium", 940, 2972),
+    ("e2-standard-2", 1930, 6249),
+    ("e2-standard-4", 3920, 13622),
+    ("e2-standard-8", 7910, 29023),
+    ("e2-standard-16", 15890, 59825),
+]
+
+# Cloud SQL tiers as (name, vCPU, memory GB), smallest first
+DB_TIERS = [
+    ("db-n1-standard-1", 1, 3.75),
+    ("db-n1-standard-2", 2, 7.5),
+    ("db-n1-standard-4", 4, 15),
+    ("db-n1-standard-8", 8, 30),
+    ("db-n1-standard-16", 16, 60),
+    ("db-n1-standard-32", 32, 120),
+    ("db-n1-standard-64", 64, 240),
+]
+
+# Filestore tiers as (name, minimum capacity GB, sustained IOPS at minimum capacity)
+FILESTORE_TIERS = [
+    ("BASIC_HDD", 1024, 600),
+    ("BASIC_SSD", 2560, 60000),
+]
+
+# Per-pod sizing of the Moodle (Apache + PHP) container
+POD_CPU_MILLICORES = 500
+POD_MEMORY_MB = 1024
+PHP_WORKERS_PER_POD = 16
+MIN_REPLICAS = 2
+
+# Headroom kept on every tier so the plan is not sized at 100% utilisation
+TARGET_CPU_UTILIZATION = 0.7
+# Requests of the GKE system DaemonSets (kube-proxy, logging/metrics agents, CSI) per node
+NODE_SYSTEM_PODS_MILLICORES = 300
+NODE_SYSTEM_PODS_MB = 400
+MAX_NODES_PER_ZONE = 10
+
+DB_CONNECTION_MEMORY_MB = 12
+DB_BASE_MEMORY_GB = 2
+DB_ADMIN_CONNECTIONS = 20
+DB_QUERIES_PER_VCPU = 2500
+
+REDIS_SESSION_KB = 200
+REDIS_BASE_CACHE_GB = 0.5
+
+MOODLEDATA_GB_PER_USER = 0.5
+
+
+@dataclass(frozen=True)
+class NodePoolPlan:
+    machine_type: str
+    min_node_count: int
+    max_node_count: int
+
+
+@dataclass(frozen=True)
+class MoodlePlan:
+    min_replicas: int
+    max_replicas: int
+    cpu_request: str
+    memory_request: str
+    target_cpu_utilization: int
+
+
+@dataclass(frozen=True)
+class DatabasePlan:
+    tier: str
+    max_connections: int
+
+
+@dataclass(frozen=True)
+class RedisPlan:
+    memory_size_gb: int
+
+
+@dataclass(frozen=True)
+class FilestorePlan:
+    tier: str
+    capacity_gb: int
+
+
+@dataclass(frozen=True)
+class CapacityPlan:
+    concurrent_users: int
+    peak_users: int
+    node_pool: NodePoolPlan
+    moodle: MoodlePlan
+    database: DatabasePlan
+    redis: RedisPlan
+    filestore: FilestorePlan
+
+
+def _workload_totals(workload_mix: dict) -> dict:
+    """Weight the per-activity profiles by the workload mix (fractions must sum to 1)."""
+    unknown = set(workload_mix) - set(WORKLOAD_PROFILES)
+    if unknown:
+        raise ValueError(f"Unknown workload types {sorted(unknown)}, expected one of {sorted(WORKLOAD_PROFILES)}")
+    if not math.isclose(sum(workload_mix.values()), 1.0, abs_tol=1e-6):
+        raise ValueError(f"Workload mix fractions must sum to 1, got {sum(workload_mix.values())}")
+
+    rps = sum(share * WORKLOAD_PROFILES[kind]["rps"] for kind, share in workload_mix.items())
+    totals = {"rps": rps}
+    # Per-request costs are averaged over requests, not over users
+    for key in ("cpu_ms", "db_queries", "file_ops"):
+        totals[key] = sum(
+            share * WORKLOAD_PROFILES[kind]["rps"] * WORKLOAD_PROFILES[kind][key]
+            for kind, share in workload_mix.items()
+        ) / rps if rps else 0.0
+    return totals
+
+
+def _replicas_for(users: int, totals: dict) -> int:
+    cpu_millicores = users * totals["rps"] * totals["cpu_ms"]
+    return max(MIN_REPLICAS, math.ceil(cpu_millicores / (POD_CPU_MILLICORES * TARGET_CPU_UTILIZATION)))
+
+
+def pods_per_node(machine_type: str) -> int:
+    """Number of Moodle pods that fit on one node of `machine_type` after system reservations."""
+    allocatable_cpu, allocatable_mb = {name: (cpu, mb) for name, cpu, mb in NODE_MACHINE_TYPES}[machine_type]
+    free_cpu = allocatable_cpu - NODE_SYSTEM_PODS_MILLICORES
+    free_mb = allocatable_mb - NODE_SYSTEM_PODS_MB
+    return max(0, min(free_cpu // POD_CPU_MILLICORES, free_mb // POD_MEMORY_MB))
+
+
+def _plan_node_pool(min_replicas: int, max_replicas: int, zones: int) -> NodePoolPlan:
+    """Pick the smallest machine type that fits the peak replica count within the per-zone node cap."""
+    for machine_type, _, _ in NODE_MACHINE_TYPES:
+        per_node = pods_per_node(machine_type)
+        if per_node < 1:
+            continue
+        # Regional node pool autoscaling bounds apply per zone
+        max_nodes = math.ceil(math.ceil(max_replicas / per_node) / zones)
+        if max_nodes <= MAX_NODES_PER_ZONE:
+            min_nodes = max(1, math.ceil(math.ceil(min_replicas / per_node) / zones))
+            return NodePoolPlan(machine_type=machine_type, min_node_count=min_nodes, max_node_count=max_nodes)
+    raise ValueError(f"No machine type can host {max_replicas} Moodle replicas within {MAX_NODES_PER_ZONE} nodes per zone")
+
+
+def _plan_database(max_replicas: int, peak_users: int, totals: dict) -> DatabasePlan:
+    max_connections = max_replicas * PHP_WORKERS_PER_POD + DB_ADMIN_CONNECTIONS
+    # Connection buffers plus an InnoDB buffer pool that grows with the active user base
+    required_gb = DB_BASE_MEMORY_GB + max_connections * DB_CONNECTION_MEMORY_MB / 1024 + peak_users / 1000
+    required_vcpu = peak_users * totals["rps"] * totals["db_queries"] / (DB_QUERIES_PER_VCPU * TARGET_CPU_UTILIZATION)
+    for tier, vcpu, memory_gb in DB_TIERS:
+        if memory_gb >= required_gb and vcpu >= required_vcpu:
+            return DatabasePlan(tier=tier, max_connections=max_connections)
+    raise ValueError(
+        f"No Cloud SQL tier offers the {required_gb:.1f} GB and {required_vcpu:.1f} vCPU needed for {peak_users} users"
+    )
+
+
+def _plan_redis(peak_users: int) -> RedisPlan:
+    sessions_gb = peak_users * REDIS_SESSION_KB / (1024 * 1024)
+    return RedisPlan(memory_size_gb=max(1, math.ceil(REDIS_BASE_CACHE_GB + sessions_gb)))
+
+
+def _plan_filestore(peak_users: int, totals: dict) -> FilestorePlan:
+    required_gb = peak_users * MOODLEDATA_GB_PER_USER
+    iops = peak_users * totals["rps"] * totals["file_ops"] / TARGET_CPU_UTILIZATION
+    for tier, min_capacity_gb, tier_iops in FILESTORE_TIERS:
+        if iops <= tier_iops:
+            return FilestorePlan(tier=tier, capacity_gb=max(min_capacity_gb, math.ceil(required_gb)))
+    raise ValueError(f"No Filestore tier sustains {iops:.0f} IOPS")
+
+
+def plan_capacity(
+    concurrent_users: int = 100,
+    peak_users: int = None,
+    workload_mix: dict = None,
+    zones: int = 3,
+) -> CapacityPlan:
+    """Derive a consistent capacity plan for the cluster and Moodle backends.
+
+    `concurrent_users` sizes the steady state (minimum replicas and nodes), `peak_users`
+    sizes everything that has to absorb a burst (maximum replicas and nodes, DB, Redis,
+    Filestore). `peak_users` defaults to twice the concurrent users.
+    """
+    if peak_users is None:
+        peak_users = 2 * concurrent_users
+    if concurrent_users < 1:
+        raise ValueError(f"concurrent_users must be positive, got {concurrent_users}")
+    if peak_users < concurrent_users:
+        raise ValueError(f"peak_users ({peak_users}) must not be below concurrent_users ({concurrent_users})")
+
+    totals = _workload_totals(workload_mix or DEFAULT_WORKLOAD_MIX)
+    min_replicas = _replicas_for(concurrent_users, totals)
+    max_replicas = max(min_replicas, _replicas_for(peak_users, totals))
+
+    return CapacityPlan(
+        concurrent_users=concurrent_users,
+        peak_users=peak_users,
+        node_pool=_plan_node_pool(min_replicas, max_replicas, zones),
+        moodle=MoodlePlan(
+            min_replicas=min_replicas,
+            max_replicas=max_replicas,
+            cpu_request=f"{POD_CPU_MILLICORES}m",
+            memory_request=f"{POD_MEMORY_MB}Mi",
+            target_cpu_utilization=int(TARGET_CPU_UTILIZATION * 100),
+        ),
+        database=_plan_database(max_replicas, peak_users, totals),
+        redis=_plan_redis(peak_users),
+        filestore=_plan_filestore(peak_users, totals),
+    )
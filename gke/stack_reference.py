@@ -0,0 +1,12 @@
+import pulumi
+
+
+def own_stack_reference(name: str) -> pulumi.StackReference:
+    """StackReference to the stack being deployed, for reading its outputs from the last update.
+
+    Outputs that did not exist on the last update (or on a stack never updated) read as None.
+    """
+    return pulumi.StackReference(
+        name,
+        stack_name=f"{pulumi.get_organization()}/{pulumi.get_project()}/{pulumi.get_stack()}",
+    )
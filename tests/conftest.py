@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Make the `gke` modules importable when pytest is run from any directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "github-actions"))
@@ -0,0 +1,49 @@
+from gke.bastion import KREW_VERSION, KUBECTL_VERSION, READINESS_NAMESPACE, render_startup_script
+
+
+def test_pinned_tool_urls():
+    script = render_startup_script()
+
+    assert f"https://dl.k8s.io/release/{KUBECTL_VERSION}/bin/linux/amd64/kubectl" in script
+    assert f"https://github.com/kubernetes-sigs/krew/releases/download/{KREW_VERSION}/krew-linux_amd64.tar.gz" in script
+    assert "stable.txt" not in script
+    assert "latest" not in script
+
+
+def test_custom_versions_and_plugins():
+    script = render_startup_script(kubectl_version="v1.30.0", krew_version="v0.4.3", krew_plugins=("ns",))
+
+    assert "/release/v1.30.0/" in script
+    assert "/download/v0.4.3/" in script
+    assert "kubectl krew install ns\n" in script
+
+
+def test_prebaked_image_skips_installs():
+    script = render_startup_script(install_tools=False)
+
+    assert "apt-get" not in script
+    assert "dl.k8s.io" not in script
+    assert "krew" not in script
+    assert "report status ready" in script
+
+
+def test_readiness_reporting():
+    script = render_startup_script(report_readiness=True)
+
+    assert f"guest-attributes/{READINESS_NAMESPACE}/$1" in script
+    assert "report status booting" in script
+    assert "trap 'report status failed' ERR" in script
+    assert script.rstrip().endswith("report status ready")
+
+
+def test_bake_script_has_no_readiness_reporting():
+    script = render_startup_script(report_readiness=False)
+
+    assert "report " not in script
+    assert "guest-attributes" not in script
+    assert "apt-get install" in script
+
+
+def test_rendering_is_deterministic():
+    assert render_startup_script() == render_startup_script()
+    assert render_startup_script().startswith("#!/bin/bash\n")
@@ -0,0 +1,17 @@
+from gke.cluster import render_mode_allowed
+
+
+def test_render_mode_allowed_on_fresh_stack():
+    assert render_mode_allowed(None, None)
+
+
+def test_render_mode_allowed_on_render_stack():
+    assert render_mode_allowed("render", "ekscluster")
+
+
+def test_render_mode_refused_on_live_stack():
+    assert not render_mode_allowed("live", "ekscluster")
+
+
+def test_render_mode_refused_on_stack_deployed_before_mode_output():
+    assert not render_mode_allowed(None, "ekscluster")
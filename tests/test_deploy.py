@@ -0,0 +1,165 @@
+import shutil
+from types import SimpleNamespace
+
+import pulumi
+import pytest
+from pulumi import automation as auto
+from pulumi.automation import OpType
+
+import deploy
+
+
+class StubStack:
+    def __init__(self, change_summary):
+        self.change_summary = change_summary
+        self.calls = []
+
+    def refresh(self, **kwargs):
+        self.calls.append(("refresh", kwargs))
+
+    def preview(self, **kwargs):
+        self.calls.append(("preview", kwargs))
+        return SimpleNamespace(change_summary=self.change_summary)
+
+    def up(self, **kwargs):
+        self.calls.append(("up", kwargs))
+
+
+@pytest.fixture
+def stub_stack(monkeypatch):
+    def make(change_summary):
+        stack = StubStack(change_summary)
+        monkeypatch.setattr(deploy, "select_stack", lambda *args, **kwargs: stack)
+        return stack
+    return make
+
+
+def test_has_changes():
+    assert not deploy.has_changes({OpType.SAME: 3})
+    assert deploy.has_changes({OpType.SAME: 3, OpType.UPDATE: 1})
+    assert not deploy.has_changes({OpType.SAME: 3, OpType.CREATE: 0})
+    assert not deploy.has_changes({})
+    assert not deploy.has_changes(None)
+
+
+def test_up_skipped_without_changes(stub_stack):
+    stack = stub_stack({OpType.SAME: 3})
+
+    timings = deploy.run("org/test-pulumi/dev", parallel=7)
+
+    assert [name for name, _ in stack.calls] == ["refresh", "preview"]
+    assert set(timings) == {"select", "refresh", "preview"}
+
+
+def test_up_runs_with_changes_and_parallel_reaches_every_phase(stub_stack):
+    stack = stub_stack({OpType.SAME: 3, OpType.UPDATE: 1})
+
+    timings = deploy.run("org/test-pulumi/dev", parallel=7)
+
+    assert [name for name, _ in stack.calls] == ["refresh", "preview", "up"]
+    assert all(kwargs["parallel"] == 7 for _, kwargs in stack.calls)
+    assert set(timings) == {"select", "refresh", "preview", "up"}
+    assert all(seconds >= 0 for seconds in timings.values())
+
+
+def test_skip_refresh_and_preview_only(stub_stack):
+    stack = stub_stack({OpType.CREATE: 1})
+
+    timings = deploy.run("org/test-pulumi/dev", skip_refresh=True, preview_only=True)
+
+    assert [name for name, _ in stack.calls] == ["preview"]
+    assert set(timings) == {"select", "preview"}
+
+
+@pytest.mark.parametrize("create, expected", [(False, "select_stack"), (True, "create_or_select_stack")])
+def test_select_stack_only_creates_when_asked(monkeypatch, create, expected):
+    called = []
+    for function in ("select_stack", "create_or_select_stack"):
+        monkeypatch.setattr(
+            deploy.auto, function,
+            lambda function=function, **kwargs: called.append((function, kwargs)) or function,
+        )
+
+    deploy.select_stack("org/test-pulumi/eks", "/work", backend_url="file:///tmp/state", create=create)
+
+    assert [function for function, _ in called] == [expected]
+    kwargs = called[0][1]
+    assert kwargs["stack_name"] == "org/test-pulumi/eks"
+    assert kwargs["opts"].env_vars == {"PULUMI_BACKEND_URL": "file:///tmp/state"}
+
+
+@pytest.mark.skipif(shutil.which("pulumi") is None, reason="needs the pulumi CLI")
+def test_inline_program_against_file_backend(tmp_path, monkeypatch):
+    def program():
+        pulumi.export("greeting", "hello")
+
+    def select_inline(*args, **kwargs):
+        return auto.create_or_select_stack(
+            stack_name="dev",
+            project_name="deploy-test",
+            program=program,
+            opts=auto.LocalWorkspaceOptions(env_vars={
+                "PULUMI_BACKEND_URL": f"file://{tmp_path}",
+                "PULUMI_CONFIG_PASSPHRASE": "test",
+            }),
+        )
+
+    monkeypatch.setattr(deploy, "select_stack", select_inline)
+
+    first = deploy.run("dev", parallel=2)
+    second = deploy.run("dev", parallel=2)
+
+    assert "up" in first
+    assert "up" not in second
+    assert select_inline().outputs()["greeting"].value == "hello"
+
+
+class CachedStubStack(StubStack):
+    """Stub stack that emits preview step events and exports a fixed state."""
+
+    def __init__(self, change_summary, steps, resources):
+        super().__init__(change_summary)
+        self.steps = steps
+        self.resources = resources
+
+    def preview(self, **kwargs):
+        for op, urn in self.steps:
+            if "on_event" in kwargs:
+                metadata = SimpleNamespace(op=op, urn=urn)
+                kwargs["on_event"](SimpleNamespace(resource_pre_event=SimpleNamespace(metadata=metadata)))
+        return super().preview(**kwargs)
+
+    def export_stack(self):
+        return SimpleNamespace(deployment={"resources": self.resources})
+
+
+def test_refresh_cache_targets_preview_updates(monkeypatch, tmp_path):
+    resources = [
+        {"urn": "vpc", "type": "gcp:compute/network:Network", "inputs": {}},
+        {"urn": "fw", "type": "gcp:compute/firewall:Firewall", "inputs": {}},
+    ]
+    cache_path = str(tmp_path / "cache.json")
+    deploy.refresh_planner.save_cache(
+        cache_path, deploy.refresh_planner.update_cache({}, resources, ["vpc", "fw"])
+    )
+    stack = CachedStubStack({OpType.UPDATE: 1}, [(OpType.UPDATE, "fw"), (OpType.SAME, "vpc")], resources)
+    monkeypatch.setattr(deploy, "select_stack", lambda *args, **kwargs: stack)
+
+    timings = deploy.run("org/test-pulumi/dev", refresh_cache=cache_path)
+
+    assert [name for name, _ in stack.calls] == ["preview", "refresh", "preview", "up"]
+    assert stack.calls[1][1]["target"] == ["fw"]
+    assert set(timings) == {"select", "plan", "refresh", "preview", "up"}
+
+
+def test_refresh_cache_reuses_plan_when_nothing_is_stale(monkeypatch, tmp_path):
+    resources = [{"urn": "vpc", "type": "gcp:compute/network:Network", "inputs": {}}]
+    cache_path = str(tmp_path / "cache.json")
+    deploy.refresh_planner.save_cache(cache_path, deploy.refresh_planner.update_cache({}, resources, ["vpc"]))
+    stack = CachedStubStack({OpType.SAME: 1}, [(OpType.SAME, "vpc")], resources)
+    monkeypatch.setattr(deploy, "select_stack", lambda *args, **kwargs: stack)
+
+    timings = deploy.run("org/test-pulumi/dev", refresh_cache=cache_path)
+
+    assert [name for name, _ in stack.calls] == ["preview"]
+    assert set(timings) == {"select", "plan", "refresh"}
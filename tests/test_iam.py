@@ -0,0 +1,88 @@
+from gke.iam import collapse_bindings, diff_bindings, merge_policy, policy_bindings
+
+SA = "serviceAccount:ci@p.iam.gserviceaccount.com"
+BASTION = "serviceAccount:bastion@p.iam.gserviceaccount.com"
+
+
+def test_collapse_dedups_and_groups_by_role():
+    pairs = [
+        ("roles/container.admin", SA),
+        ("roles/container.admin", BASTION),
+        ("roles/container.admin", SA),
+        ("roles/storage.admin", SA),
+    ]
+    assert collapse_bindings(pairs) == {
+        "roles/container.admin": [BASTION, SA],
+        "roles/storage.admin": [SA],
+    }
+
+
+def test_collapse_empty():
+    assert collapse_bindings([]) == {}
+
+
+def test_diff_bindings():
+    current = {"roles/a": ["u:1", "u:2"], "roles/b": ["u:1"]}
+    desired = {"roles/a": ["u:1", "u:3"], "roles/c": ["u:1"]}
+
+    additions, removals = diff_bindings(current, desired)
+
+    assert additions == {"roles/a": ["u:3"], "roles/c": ["u:1"]}
+    assert removals == {"roles/a": ["u:2"], "roles/b": ["u:1"]}
+    assert diff_bindings(desired, desired) == ({}, {})
+
+
+def test_merge_keeps_foreign_members_and_adds_desired():
+    policy = {
+        "version": 1,
+        "etag": "BwX1",
+        "bindings": [
+            {"role": "roles/owner", "members": ["user:admin@example.com"]},
+            {"role": "roles/container.admin", "members": ["user:dev@example.com"]},
+        ],
+    }
+    merged = merge_policy(policy, {"roles/container.admin": [SA], "roles/storage.admin": [SA]})
+
+    assert merged["etag"] == "BwX1"
+    assert merged["version"] == 1
+    assert policy_bindings(merged) == {
+        "roles/container.admin": [SA, "user:dev@example.com"],
+        "roles/owner": ["user:admin@example.com"],
+        "roles/storage.admin": [SA],
+    }
+
+
+def test_merge_leaves_conditional_bindings_alone():
+    conditional = {
+        "role": "roles/container.admin",
+        "members": [SA],
+        "condition": {"title": "temporary", "expression": "request.time < timestamp('2030-01-01T00:00:00Z')"},
+    }
+    policy = {"bindings": [conditional]}
+
+    merged = merge_policy(policy, {"roles/container.admin": [BASTION]}, previous={"roles/container.admin": [SA]})
+
+    assert conditional in merged["bindings"]
+    assert policy_bindings(merged) == {"roles/container.admin": [BASTION]}
+
+
+def test_merge_revokes_members_dropped_since_previous_run():
+    policy = {
+        "bindings": [
+            {"role": "roles/container.admin", "members": [BASTION, SA, "user:dev@example.com"]},
+            {"role": "roles/compute.storageAdmin", "members": [SA]},
+        ],
+    }
+    previous = {"roles/container.admin": [BASTION, SA], "roles/compute.storageAdmin": [SA]}
+
+    merged = merge_policy(policy, {"roles/container.admin": [SA]}, previous=previous)
+
+    # The bastion grant and the whole storageAdmin binding were ours and are gone,
+    # the member granted outside this program stays
+    assert policy_bindings(merged) == {"roles/container.admin": [SA, "user:dev@example.com"]}
+
+
+def test_merge_without_previous_never_removes():
+    policy = {"bindings": [{"role": "roles/container.admin", "members": [BASTION]}]}
+    merged = merge_policy(policy, {"roles/container.admin": [SA]})
+    assert policy_bindings(merged) == {"roles/container.admin": [BASTION, SA]}
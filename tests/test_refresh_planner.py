@@ -0,0 +1,60 @@
+from pulumi.automation import OpType
+
+import refresh_planner
+
+
+def resource(urn, inputs=None, resource_type="gcp:compute/network:Network"):
+    return {"urn": urn, "type": resource_type, "inputs": inputs or {}}
+
+
+def test_new_and_drift_prone_resources_are_refreshed():
+    resources = [
+        resource("vpc"),
+        resource("pool", resource_type="gcp:container/nodePool:NodePool"),
+        resource("stack", resource_type="pulumi:pulumi:Stack"),
+    ]
+    assert refresh_planner.plan_refresh(resources, {}, now=0) == {"vpc": "new", "pool": "new"}
+
+    cache = refresh_planner.update_cache({}, resources, ["vpc", "pool"], now=0)
+    assert refresh_planner.plan_refresh(resources, cache, now=10) == {"pool": "drift-prone"}
+
+
+def test_changed_inputs_and_ttl():
+    resources = [resource("vpc", {"name": "a"})]
+    cache = refresh_planner.update_cache({}, resources, ["vpc"], now=0)
+
+    assert refresh_planner.plan_refresh([resource("vpc", {"name": "b"})], cache, now=10) == {"vpc": "inputs changed"}
+    assert refresh_planner.plan_refresh(resources, cache, now=10, ttl_seconds=5) == {"vpc": "ttl expired"}
+
+
+def test_resources_written_by_up_are_not_refreshed_again():
+    before = [resource("vpc", {"name": "a"}), resource("nat", {"name": "n"})]
+    after = [resource("vpc", {"name": "b"}), resource("nat", {"name": "n"}), resource("fw")]
+    cache = refresh_planner.update_cache({}, before, ["vpc", "nat"], now=0)
+
+    updated = refresh_planner.changed_urns(before, after)
+    assert updated == {"vpc", "fw"}
+
+    cache = refresh_planner.update_cache(cache, after, updated, now=5)
+    assert refresh_planner.plan_refresh(after, cache, now=10) == {}
+    assert cache["nat"]["refreshed_at"] == 0
+
+
+def test_deleted_resources_leave_the_cache():
+    cache = refresh_planner.update_cache({}, [resource("vpc"), resource("fw")], ["vpc", "fw"], now=0)
+    assert set(refresh_planner.update_cache(cache, [resource("vpc")], [], now=1)) == {"vpc"}
+
+
+def test_preview_pending_steps_are_refreshed_even_when_cached():
+    resources = [resource("vpc"), resource("fw"), resource("ip")]
+    cache = refresh_planner.update_cache({}, resources, ["vpc", "fw", "ip"], now=0)
+    steps = [(OpType.UPDATE, "vpc"), (OpType.SAME, "fw"), ("replace", "ip"), (OpType.CREATE, "new")]
+
+    pending = refresh_planner.pending_urns(steps)
+
+    assert pending == {"vpc", "ip"}
+    # URNs not in the state yet (creates) have nothing to refresh
+    assert refresh_planner.plan_refresh(resources, cache, now=10, pending=pending | {"new"}) == {
+        "vpc": "pending update",
+        "ip": "pending update",
+    }
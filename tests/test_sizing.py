@@ -0,0 +1,100 @@
+import pytest
+
+from gke.sizing import (
+    DB_TIERS,
+    MAX_NODES_PER_ZONE,
+    NODE_MACHINE_TYPES,
+    NODE_SYSTEM_PODS_MB,
+    NODE_SYSTEM_PODS_MILLICORES,
+    POD_CPU_MILLICORES,
+    POD_MEMORY_MB,
+    plan_capacity,
+    pods_per_node,
+)
+
+MACHINE_ORDER = [name for name, _, _ in NODE_MACHINE_TYPES]
+DB_ORDER = [name for name, _, _ in DB_TIERS]
+
+
+def test_default_plan():
+    plan = plan_capacity()
+
+    assert (plan.concurrent_users, plan.peak_users) == (100, 200)
+    assert plan.node_pool.machine_type == "e2-small"
+    assert (plan.node_pool.min_node_count, plan.node_pool.max_node_count) == (1, 2)
+    assert (plan.moodle.min_replicas, plan.moodle.max_replicas) == (3, 6)
+    assert plan.database.tier == "db-n1-standard-1"
+    assert plan.database.max_connections == 116
+    assert plan.redis.memory_size_gb == 1
+    assert (plan.filestore.tier, plan.filestore.capacity_gb) == ("BASIC_HDD", 1024)
+
+
+def test_plan_is_monotonic_in_users():
+    plans = [plan_capacity(users) for users in (1, 10, 50, 100, 500, 1000, 2000, 5000)]
+
+    for smaller, larger in zip(plans, plans[1:]):
+        assert larger.moodle.min_replicas >= smaller.moodle.min_replicas
+        assert larger.moodle.max_replicas >= smaller.moodle.max_replicas
+        assert MACHINE_ORDER.index(larger.node_pool.machine_type) >= MACHINE_ORDER.index(smaller.node_pool.machine_type)
+        assert DB_ORDER.index(larger.database.tier) >= DB_ORDER.index(smaller.database.tier)
+        assert larger.database.max_connections >= smaller.database.max_connections
+        assert larger.redis.memory_size_gb >= smaller.redis.memory_size_gb
+        assert larger.filestore.capacity_gb >= smaller.filestore.capacity_gb
+
+
+@pytest.mark.parametrize("users, zones", [(1, 1), (100, 1), (1000, 1), (100, 3), (1000, 3), (5000, 3)])
+def test_node_bounds_cover_replicas(users, zones):
+    plan = plan_capacity(users, zones=zones)
+    per_node = pods_per_node(plan.node_pool.machine_type)
+
+    assert plan.node_pool.min_node_count <= plan.node_pool.max_node_count <= MAX_NODES_PER_ZONE
+    assert plan.node_pool.max_node_count * zones * per_node >= plan.moodle.max_replicas
+    assert plan.node_pool.min_node_count * zones * per_node >= plan.moodle.min_replicas
+
+
+@pytest.mark.parametrize("machine_type, allocatable_cpu, allocatable_mb", NODE_MACHINE_TYPES)
+def test_pods_fit_allocatable_resources(machine_type, allocatable_cpu, allocatable_mb):
+    per_node = pods_per_node(machine_type)
+
+    assert per_node * POD_CPU_MILLICORES + NODE_SYSTEM_PODS_MILLICORES <= allocatable_cpu
+    assert per_node * POD_MEMORY_MB + NODE_SYSTEM_PODS_MB <= allocatable_mb
+
+
+def test_shared_core_types_fit_one_pod():
+    assert pods_per_node("e2-small") == 1
+    assert pods_per_node("e2-medium") == 1
+
+
+def test_thousand_users_plan_is_schedulable():
+    plan = plan_capacity(1000)
+
+    assert plan.node_pool.machine_type == "e2-standard-2"
+    assert plan.node_pool.max_node_count * 3 * pods_per_node("e2-standard-2") >= plan.moodle.max_replicas
+
+
+def test_peak_defaults_to_twice_concurrent():
+    assert plan_capacity(40).peak_users == 80
+
+
+@pytest.mark.parametrize("mix", [
+    {"browse": 0.5, "quiz": 0.2},
+    {"browse": 0.9, "video": 0.1},
+])
+def test_invalid_workload_mix(mix):
+    with pytest.raises(ValueError):
+        plan_capacity(100, workload_mix=mix)
+
+
+def test_peak_below_concurrent():
+    with pytest.raises(ValueError, match="peak_users"):
+        plan_capacity(100, peak_users=50)
+
+
+def test_non_positive_users():
+    with pytest.raises(ValueError, match="concurrent_users"):
+        plan_capacity(0)
+
+
+def test_more_replicas_than_node_cap():
+    with pytest.raises(ValueError, match="nodes per zone"):
+        plan_capacity(100_000)